@@ -2,22 +2,38 @@ from __future__ import annotations
 
 """FastAPI application entry-point for the recipe chatbot."""
 
+import json
+from contextlib import asynccontextmanager
 from pathlib import Path
-from typing import Final, List, Dict
+from typing import AsyncIterator, Final, List, Dict, Literal
 
 from fastapi import FastAPI, HTTPException, status
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.staticfiles import StaticFiles
 from pydantic import BaseModel, Field
 
-from backend.utils import get_agent_response  # noqa: WPS433 import from parent
+from backend.utils import (  # noqa: WPS433 import from parent
+    SYSTEM_MESSAGE,
+    get_agent_response,
+    save_semantic_cache,
+    stream_agent_response,
+)
 
 # -----------------------------------------------------------------------------
 # Application setup
 # -----------------------------------------------------------------------------
 
 APP_TITLE: Final[str] = "Recipe Chatbot"
-app = FastAPI(title=APP_TITLE)
+
+
+@asynccontextmanager
+async def lifespan(_: FastAPI) -> AsyncIterator[None]:
+    """Persist the semantic cache when the server shuts down."""
+    yield
+    save_semantic_cache()
+
+
+app = FastAPI(title=APP_TITLE, lifespan=lifespan)
 
 # Serve static assets (currently just the HTML) under `/static/*`.
 STATIC_DIR = Path(__file__).parent.parent / "frontend"
@@ -32,7 +48,7 @@ app.mount("/static", StaticFiles(directory=STATIC_DIR), name="static")
 class ChatMessage(BaseModel):
     """Schema for a single message in the chat history."""
 
-    role: str = Field(
+    role: Literal["system", "user", "assistant"] = Field(
         ..., description="Role of the message sender (system, user, or assistant)."
     )
     content: str = Field(..., description="Content of the message.")
@@ -59,6 +75,18 @@ class ChatResponse(BaseModel):
 # -----------------------------------------------------------------------------
 
 
+def _agent_messages(payload: ChatRequest) -> List[Dict[str, str]]:
+    """Build the agent's message list: our system prompt, then the conversation.
+
+    System messages from the client (including the one echoed back in a
+    previous response) are dropped, so the agent always sees ours first.
+    """
+    return [
+        SYSTEM_MESSAGE,
+        *(msg.model_dump() for msg in payload.messages if msg.role != "system"),
+    ]
+
+
 @app.post("/chat", response_model=ChatResponse)
 async def chat_endpoint(payload: ChatRequest) -> ChatResponse:  # noqa: WPS430
     """Main conversational endpoint.
@@ -66,12 +94,10 @@ async def chat_endpoint(payload: ChatRequest) -> ChatResponse:  # noqa: WPS430
     It proxies the user's message list to the underlying agent and returns the updated list.
     """
     # Convert Pydantic models to simple dicts for the agent
-    request_messages: List[Dict[str, str]] = [
-        msg.model_dump() for msg in payload.messages
-    ]
+    request_messages = _agent_messages(payload)
 
     try:
-        updated_messages_dicts = get_agent_response(request_messages)
+        updated_messages_dicts = await get_agent_response(request_messages)
     except Exception as exc:  # noqa: BLE001 broad; surface as HTTP 500
         # In production you would log the traceback here.
         raise HTTPException(
@@ -86,6 +112,31 @@ async def chat_endpoint(payload: ChatRequest) -> ChatResponse:  # noqa: WPS430
     return ChatResponse(messages=response_messages)
 
 
+@app.post("/chat/stream")
+async def chat_stream_endpoint(payload: ChatRequest) -> StreamingResponse:  # noqa: WPS430
+    """Streaming variant of `/chat`.
+
+    Emits the assistant's reply as Server-Sent Events, one JSON-encoded text
+    fragment per `data:` line, so the UI can render tokens as they arrive.
+    """
+    request_messages = _agent_messages(payload)
+
+    async def event_stream() -> AsyncIterator[str]:
+        try:
+            async for fragment in stream_agent_response(request_messages):
+                yield f"data: {json.dumps(fragment)}\n\n"
+        except Exception as exc:  # noqa: BLE001 headers already sent; report in-band
+            yield f"event: error\ndata: {json.dumps(str(exc))}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Stop browsers and reverse proxies (e.g. nginx) from caching or
+        # buffering the stream, which would undo the time-to-first-token gain.
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get("/", response_class=HTMLResponse)
 async def index() -> HTMLResponse:  # noqa: WPS430
     """Serve the chat UI."""
@@ -0,0 +1,190 @@
+from __future__ import annotations
+
+"""Embedding-similarity response cache for near-duplicate recipe queries.
+
+Users rarely phrase the same request identically ("quick vegan breakfast" vs.
+"fast vegan breakfast idea"), so an exact-match cache seldom hits. This module
+embeds the user's message via *litellm*, looks up its nearest neighbour in an
+in-memory HNSW index, and returns the stored reply when the cosine similarity
+clears a threshold.
+
+The index is provided by the optional ``hnswlib`` dependency
+(``uv sync --extra semantic-cache``); it is only imported when the cache is
+actually constructed. The index and its entries can be saved to a directory
+and loaded back so a restarted process does not start cold.
+"""
+
+import json
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import Final, List, Tuple
+
+import litellm  # type: ignore
+
+# --- Constants -------------------------------------------------------------------
+
+INITIAL_CAPACITY: Final[int] = 1024
+HNSW_EF_CONSTRUCTION: Final[int] = 200
+HNSW_M: Final[int] = 16
+
+ENTRIES_FILENAME: Final[str] = "entries.json"
+
+
+# --- Cache -----------------------------------------------------------------------
+
+
+class SemanticCache:
+    """Approximate nearest-neighbour cache mapping prompts to assistant replies.
+
+    Parameters
+    ----------
+    model:
+        Embedding model name, in any format *litellm* understands.
+    threshold:
+        Minimum cosine similarity for a lookup to count as a hit.
+    """
+
+    def __init__(self, model: str, threshold: float) -> None:
+        # Imported here so a missing `semantic-cache` extra fails at startup
+        # rather than on the first request.
+        import hnswlib  # type: ignore  # noqa: WPS433 optional dependency
+
+        self._hnswlib = hnswlib
+        self.model = model
+        self.threshold = threshold
+        self._index = None  # Created lazily once the embedding size is known.
+        self._entries: List[Tuple[str, str, str]] = []  # (namespace, prompt, reply)
+        self._lock = threading.Lock()
+
+    async def embed(self, text: str) -> List[float]:
+        """Embed *text* with the configured model."""
+
+        response = await litellm.aembedding(model=self.model, input=[text])
+        return response["data"][0]["embedding"]  # type: ignore[index]
+
+    def _ensure_index(self, dim: int) -> None:
+        if self._index is not None:
+            return
+
+        index = self._hnswlib.Index(space="cosine", dim=dim)
+        index.init_index(
+            max_elements=INITIAL_CAPACITY,
+            ef_construction=HNSW_EF_CONSTRUCTION,
+            M=HNSW_M,
+        )
+        self._index = index
+
+    def lookup(self, namespace: str, embedding: List[float]) -> str | None:
+        """Return the cached reply for the nearest stored prompt, if close enough.
+
+        Only entries stored under the same *namespace* (e.g. a hash of the
+        model and system prompt) are considered a match.
+        """
+
+        entries = self._entries
+
+        def in_namespace(label: int) -> bool:
+            return entries[label][0] == namespace
+
+        with self._lock:
+            if self._index is None or not entries:
+                return None
+            try:
+                labels, distances = self._index.knn_query(
+                    [embedding], k=1, filter=in_namespace
+                )
+            except RuntimeError:  # No entries in this namespace.
+                return None
+            _, _, reply = entries[int(labels[0][0])]
+            similarity = 1.0 - float(distances[0][0])
+
+        if similarity < self.threshold:
+            return None
+        return reply
+
+    def add(
+        self, namespace: str, prompt: str, embedding: List[float], reply: str
+    ) -> None:
+        """Store *reply* as the answer for *prompt* under *namespace*."""
+
+        with self._lock:
+            self._ensure_index(len(embedding))
+            label = len(self._entries)
+            if label >= self._index.get_max_elements():
+                self._index.resize_index(2 * self._index.get_max_elements())
+            self._index.add_items([embedding], [label])
+            self._entries.append((namespace, prompt, reply))
+
+    def save(self, directory: Path) -> None:
+        """Write the index and its entries to *directory*, if anything is cached.
+
+        The index goes to a uniquely named file and ``entries.json``, which
+        names that file, is swapped in last with ``os.replace``, so readers
+        always see a matching pair even if the process dies mid-write. Only
+        the index named by the replaced ``entries.json`` is removed. When
+        several workers save at once the last writer wins, and an index file
+        written by a losing worker may be left behind in *directory*.
+        """
+
+        with self._lock:
+            if self._index is None:
+                return
+            directory.mkdir(parents=True, exist_ok=True)
+            index_name = f"index-{uuid.uuid4().hex}.bin"
+            tmp_index_path = directory / f".{index_name}.tmp"
+            self._index.save_index(str(tmp_index_path))
+            os.replace(tmp_index_path, directory / index_name)
+            metadata = {
+                "model": self.model,
+                "dim": self._index.dim,
+                "index": index_name,
+                "entries": list(self._entries),
+            }
+
+        tmp_entries_path = directory / f".{ENTRIES_FILENAME}.{uuid.uuid4().hex}.tmp"
+        tmp_entries_path.write_text(json.dumps(metadata), encoding="utf-8")
+        entries_path = directory / ENTRIES_FILENAME
+        try:
+            old_index_name = json.loads(entries_path.read_text(encoding="utf-8"))["index"]
+        except (OSError, ValueError, KeyError, TypeError):
+            old_index_name = None
+        os.replace(tmp_entries_path, entries_path)
+
+        if isinstance(old_index_name, str) and old_index_name != index_name:
+            (directory / Path(old_index_name).name).unlink(missing_ok=True)
+
+    def load(self, directory: Path) -> None:
+        """Restore a cache previously written by :meth:`save`.
+
+        Missing or unreadable files, an index that does not match its entries,
+        or a cache built with a different embedding model all leave the cache
+        empty.
+        """
+
+        entries_path = directory / ENTRIES_FILENAME
+        if not entries_path.exists():
+            return
+
+        try:
+            metadata = json.loads(entries_path.read_text(encoding="utf-8"))
+            if metadata["model"] != self.model:
+                return
+            entries = [
+                (str(namespace), str(prompt), str(reply))
+                for namespace, prompt, reply in metadata["entries"]
+            ]
+            index = self._hnswlib.Index(space="cosine", dim=metadata["dim"])
+            index.load_index(
+                str(directory / metadata["index"]),
+                max_elements=max(INITIAL_CAPACITY, len(entries)),
+            )
+        except (OSError, RuntimeError, ValueError, KeyError, TypeError):
+            return
+        if index.get_current_count() != len(entries):
+            return
+
+        with self._lock:
+            self._index = index
+            self._entries = entries
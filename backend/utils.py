@@ -6,12 +6,23 @@ This module centralises the system prompt, environment loading, and the
 wrapper around litellm so the rest of the application stays decluttered.
 """
 
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
 from pathlib import Path
-from typing import Final, List, Dict
+from typing import Any, AsyncIterator, Callable, Final, List, Dict, Tuple
 
+import httpx
 import litellm  # type: ignore
 from dotenv import load_dotenv
 
+from backend.semantic_cache import SemanticCache
+
+logger = logging.getLogger(__name__)
+
 # Ensure the .env file is loaded as early as possible.
 load_dotenv(override=False)
 
@@ -64,25 +75,250 @@ A quick and delicious way to prepare salmon with a crispy skin and moist interio
 ```
 """
 
+# The system message every conversation sent to the agent must start with.
+# Treat as read-only: the same object is reused across every request.
+SYSTEM_MESSAGE: Final[Dict[str, str]] = {"role": "system", "content": SYSTEM_PROMPT}
+
 # Fetch configuration *after* we loaded the .env file.
-MODEL_NAME: Final[str] = (
-    Path.cwd().with_suffix("")  # noqa: WPS432  # dummy call to satisfy linters about unused Path
-    and (  # noqa: W504 line break for readability
-        __import__("os").environ.get("MODEL_NAME", "gpt-3.5-turbo")
-    )
+MODEL_NAME: Final[str] = os.environ.get("MODEL_NAME", "gpt-3.5-turbo")
+
+
+def _detect_provider(model_name: str) -> str:
+    """Return litellm's provider name for *model_name*, or "" if it is unknown."""
+
+    try:
+        return litellm.get_llm_provider(model_name)[1]
+    except Exception:  # noqa: BLE001 unknown provider; litellm will complain at call time
+        return ""
+
+
+# Provider behind MODEL_NAME, used to pick the right prompt-caching mechanism.
+MODEL_PROVIDER: Final[str] = _detect_provider(MODEL_NAME)
+
+# Shared async HTTP client so connections (and their TLS sessions) are reused
+# across requests instead of being re-established per call. HTTP/2 lets
+# concurrent requests to the same provider share one multiplexed connection.
+litellm.aclient_session = httpx.AsyncClient(
+    http2=True,
+    limits=httpx.Limits(
+        max_connections=100, max_keepalive_connections=50, keepalive_expiry=60
+    ),
+)
+
+# Opt-in exact-match response cache (set RECIPE_RESPONSE_CACHE=1 to enable).
+RESPONSE_CACHE_ENABLED: Final[bool] = os.environ.get("RECIPE_RESPONSE_CACHE") == "1"
+RESPONSE_CACHE_SIZE: Final[int] = 1024
+
+# Opt-in embedding-similarity cache for first-turn queries
+# (set RECIPE_SEMANTIC_CACHE=1 and install the `semantic-cache` extra).
+SEMANTIC_CACHE_ENABLED: Final[bool] = os.environ.get("RECIPE_SEMANTIC_CACHE") == "1"
+SEMANTIC_CACHE_MODEL: Final[str] = os.environ.get(
+    "RECIPE_SEMANTIC_CACHE_MODEL", "text-embedding-3-small"
+)
+SEMANTIC_CACHE_THRESHOLD: Final[float] = float(
+    os.environ.get("RECIPE_SEMANTIC_CACHE_THRESHOLD", "0.92")
+)
+# Optional directory the semantic cache is loaded from at startup and saved to
+# on shutdown, so it survives restarts.
+SEMANTIC_CACHE_DIR: Final[str | None] = os.environ.get("RECIPE_SEMANTIC_CACHE_DIR")
+
+
+# --- Response cache --------------------------------------------------------------
+
+_response_cache: "OrderedDict[str, str]" = OrderedDict()
+_response_cache_lock = threading.Lock()
+
+
+def _response_cache_key(messages: List[Dict[str, str]]) -> str:
+    """Return a stable digest of the model name and full conversation."""
+
+    payload = json.dumps([MODEL_NAME, messages], sort_keys=True)
+    return hashlib.blake2b(payload.encode("utf-8")).hexdigest()
+
+
+def _response_cache_get(key: str) -> str | None:
+    with _response_cache_lock:
+        reply = _response_cache.get(key)
+        if reply is not None:
+            _response_cache.move_to_end(key)
+        return reply
+
+
+def _response_cache_put(key: str, reply: str) -> None:
+    with _response_cache_lock:
+        _response_cache[key] = reply
+        _response_cache.move_to_end(key)
+        if len(_response_cache) > RESPONSE_CACHE_SIZE:
+            _response_cache.popitem(last=False)
+
+
+_semantic_cache: SemanticCache | None = (
+    SemanticCache(SEMANTIC_CACHE_MODEL, SEMANTIC_CACHE_THRESHOLD)
+    if SEMANTIC_CACHE_ENABLED
+    else None
 )
+if _semantic_cache is not None and SEMANTIC_CACHE_DIR:
+    _semantic_cache.load(Path(SEMANTIC_CACHE_DIR))
+
+
+def save_semantic_cache() -> None:
+    """Persist the semantic cache to ``RECIPE_SEMANTIC_CACHE_DIR``, if configured."""
+
+    if _semantic_cache is not None and SEMANTIC_CACHE_DIR:
+        _semantic_cache.save(Path(SEMANTIC_CACHE_DIR))
+
+
+def _semantic_cache_query(messages: List[Dict[str, str]]) -> Tuple[str, str] | None:
+    """Return ``(namespace, prompt)`` if *messages* is eligible for the semantic cache.
+
+    Only a system prompt followed by a single user message qualifies: later
+    turns depend on earlier context that the embedding does not capture.
+    """
+
+    if len(messages) != 2 or messages[1]["role"] != "user":
+        return None
+    namespace_payload = json.dumps([MODEL_NAME, messages[0]])
+    namespace = hashlib.blake2b(namespace_payload.encode("utf-8")).hexdigest()
+    return namespace, messages[1]["content"]
+
+
+# --- Prompt caching --------------------------------------------------------------
+
+
+def _prompt_cache_request(
+    messages: List[Dict[str, str]],
+) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Return the messages and extra kwargs that let the provider cache the system prompt.
+
+    The system prompt is an identical prefix on every request, so providers
+    that support prefix caching can skip re-processing it:
+
+    * Anthropic only caches blocks explicitly marked with ``cache_control``.
+    * OpenAI caches automatically; ``prompt_cache_key`` routes requests that
+      share a prefix to the same cache.
+
+    Self-hosted vLLM backends need ``--enable-prefix-caching`` on the server.
+    *messages* always starts with :data:`SYSTEM_MESSAGE`.
+    """
+
+    system_prompt = messages[0]["content"]
+    if MODEL_PROVIDER == "anthropic":
+        system_message = {
+            "role": "system",
+            "content": [
+                {
+                    "type": "text",
+                    "text": system_prompt,
+                    "cache_control": {"type": "ephemeral"},
+                }
+            ],
+        }
+        return [system_message, *messages[1:]], {}
+    if MODEL_PROVIDER == "openai":
+        cache_key = hashlib.blake2b(
+            system_prompt.encode("utf-8"), digest_size=16
+        ).hexdigest()
+        return messages, {"extra_body": {"prompt_cache_key": cache_key}}
+    return messages, {}
 
 
 # --- Agent wrapper ---------------------------------------------------------------
 
 
-def get_agent_response(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:  # noqa: WPS231
+async def _lookup_cached_reply(
+    messages: List[Dict[str, str]],
+) -> Tuple[str | None, Callable[[str], None]]:
+    """Look *messages* up in the enabled response caches.
+
+    Returns
+    -------
+    Tuple[str | None, Callable[[str], None]]
+        The cached reply (``None`` on a miss) and a function that stores a
+        freshly generated reply in the caches that were consulted.
+    """
+
+    cache_key = _response_cache_key(messages) if RESPONSE_CACHE_ENABLED else None
+    cached_reply = _response_cache_get(cache_key) if cache_key else None
+
+    semantic_query = (
+        _semantic_cache_query(messages)
+        if _semantic_cache is not None and cached_reply is None
+        else None
+    )
+    semantic_embedding: List[float] = []
+    if semantic_query is not None:
+        # The semantic cache is an optimisation: if embedding or lookup fails,
+        # answer the request from the model and skip storing the reply.
+        try:
+            semantic_embedding = await _semantic_cache.embed(semantic_query[1])
+            cached_reply = _semantic_cache.lookup(semantic_query[0], semantic_embedding)
+        except Exception:  # noqa: BLE001 treat any cache failure as a miss
+            logger.exception("Semantic cache lookup failed; treating as a miss")
+            semantic_query = None
+
+    def store_reply(reply: str) -> None:
+        if cache_key:
+            _response_cache_put(cache_key, reply)
+        if semantic_query is not None:
+            try:
+                _semantic_cache.add(*semantic_query, semantic_embedding, reply)
+            except Exception:  # noqa: BLE001 never lose a completed reply
+                logger.exception("Semantic cache store failed; reply not cached")
+
+    return cached_reply, store_reply
+
+
+async def stream_agent_response(messages: List[Dict[str, str]]) -> AsyncIterator[str]:  # noqa: WPS231
+    """Stream the assistant's reply to *messages* as it is generated.
+
+    Parameters
+    ----------
+    messages:
+        The full conversation history, starting with `SYSTEM_MESSAGE`. Each
+        item is a dict with "role" and "content".
+
+    Yields
+    ------
+    str
+        Successive fragments of the assistant's reply. A cached reply is
+        yielded as a single fragment.
+    """
+
+    cached_reply, store_reply = await _lookup_cached_reply(messages)
+    if cached_reply is not None:
+        yield cached_reply
+        return
+
+    # litellm is model-agnostic; we only need to supply the model name and key.
+    request_messages, request_kwargs = _prompt_cache_request(messages)
+    stream = await litellm.acompletion(
+        model=MODEL_NAME,
+        messages=request_messages,  # Pass the full history
+        stream=True,
+        **request_kwargs,
+    )
+
+    fragments: List[str] = []
+    async for chunk in stream:
+        fragment = chunk.choices[0].delta.content
+        if fragment:
+            fragments.append(fragment)
+            yield fragment
+
+    store_reply("".join(fragments).strip())
+
+
+async def get_agent_response(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:  # noqa: WPS231
     """Call the underlying large-language model via *litellm*.
 
+    The call is awaited rather than blocking, so a single event loop can serve
+    many conversations concurrently.
+
     Parameters
     ----------
     messages:
-        The full conversation history. Each item is a dict with "role" and "content".
+        The full conversation history, starting with `SYSTEM_MESSAGE`. Each
+        item is a dict with "role" and "content".
 
     Returns
     -------
@@ -90,26 +326,25 @@ def get_agent_response(messages: List[Dict[str, str]]) -> List[Dict[str, str]]:
         The updated conversation history, including the assistant's new reply.
     """
 
-    # litellm is model-agnostic; we only need to supply the model name and key.
-    # The first message is assumed to be the system prompt if not explicitly provided
-    # or if the history is empty. We'll ensure the system prompt is always first.
-    current_messages: List[Dict[str, str]]
-    if not messages or messages[0]["role"] != "system":
-        current_messages = [{"role": "system", "content": SYSTEM_PROMPT}] + messages
+    cached_reply, store_reply = await _lookup_cached_reply(messages)
+    if cached_reply is not None:
+        assistant_reply_content = cached_reply
     else:
-        current_messages = messages
-
-    completion = litellm.completion(
-        model=MODEL_NAME,
-        messages=current_messages,  # Pass the full history
-    )
+        # litellm is model-agnostic; we only need to supply the model name and key.
+        request_messages, request_kwargs = _prompt_cache_request(messages)
+        completion = await litellm.acompletion(
+            model=MODEL_NAME,
+            messages=request_messages,  # Pass the full history
+            **request_kwargs,
+        )
 
-    assistant_reply_content: str = completion["choices"][0]["message"][
-        "content"
-    ].strip()  # type: ignore[index]
+        assistant_reply_content = completion["choices"][0]["message"][
+            "content"
+        ].strip()  # type: ignore[index]
+        store_reply(assistant_reply_content)
 
     # Append assistant's response to the history
-    updated_messages = current_messages + [
+    updated_messages = messages + [
         {"role": "assistant", "content": assistant_reply_content}
     ]
     return updated_messages
@@ -14,17 +14,17 @@ endpoint concurrently, and stores the results for later manual evaluation.
 """
 
 import argparse
+import asyncio
 import csv
 import datetime as dt
 from typing import List, Tuple, Dict
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from rich.console import Console, Group
 from rich.panel import Panel
 from rich.text import Text
 from rich.markdown import Markdown
 
-from backend.utils import get_agent_response, SYSTEM_PROMPT
+from backend.utils import get_agent_response, SYSTEM_MESSAGE
 
 # -----------------------------------------------------------------------------
 # Configuration helpers
@@ -34,20 +34,25 @@ DEFAULT_CSV: Path = Path("data/sample_queries.csv")
 RESULTS_DIR: Path = Path("results")
 RESULTS_DIR.mkdir(exist_ok=True)
 
-MAX_WORKERS = 10  # For ThreadPoolExecutor
+MAX_CONCURRENCY = 10  # Maximum in-flight agent calls
 
 # -----------------------------------------------------------------------------
 # Core logic
 # -----------------------------------------------------------------------------
 
 
-# --- Sync function for ThreadPoolExecutor ---
-def process_query_sync(query_id: str, query: str) -> Tuple[str, str, str]:
+async def process_query(
+    query_id: str, query: str, semaphore: asyncio.Semaphore
+) -> Tuple[str, str, str]:
     """Processes a single query by calling the agent directly."""
-    initial_messages: List[Dict[str, str]] = [{"role": "user", "content": query}]
+    initial_messages: List[Dict[str, str]] = [
+        SYSTEM_MESSAGE,
+        {"role": "user", "content": query},
+    ]
     try:
         # get_agent_response now returns the full history
-        updated_history = get_agent_response(initial_messages)
+        async with semaphore:
+            updated_history = await get_agent_response(initial_messages)
         # Extract the last assistant message for the result
         assistant_reply = ""
         if updated_history and updated_history[-1]["role"] == "assistant":
@@ -59,9 +64,8 @@ def process_query_sync(query_id: str, query: str) -> Tuple[str, str, str]:
         return query_id, query, f"Error processing query: {str(e)}"
 
 
-# Renamed and made sync
-def run_bulk_test(csv_path: Path) -> None:
-    """Main entry point for bulk testing (synchronous version)."""
+async def run_bulk_test(csv_path: Path) -> None:
+    """Main entry point for bulk testing."""
 
     with csv_path.open("r", newline="", encoding="utf-8") as csv_file:
         reader = csv.DictReader(csv_file)
@@ -77,20 +81,24 @@ def run_bulk_test(csv_path: Path) -> None:
 
     console = Console()
     results_data: List[Tuple[str, str, str]] = []  # Will store (id, query, response)
-    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
-        future_to_data = {
-            executor.submit(process_query_sync, item["id"], item["query"]): item
-            for item in input_data
-        }
-        console.print(
-            f"[bold blue]Submitting {len(input_data)} queries to the executor...[/bold blue]"
-        )
-        for i, future in enumerate(as_completed(future_to_data)):
-            item_data = future_to_data[future]
+    semaphore = asyncio.Semaphore(MAX_CONCURRENCY)
+    task_to_data = {
+        asyncio.create_task(process_query(item["id"], item["query"], semaphore)): item
+        for item in input_data
+    }
+    console.print(
+        f"[bold blue]Submitting {len(input_data)} queries to the agent...[/bold blue]"
+    )
+    pending = set(task_to_data)
+    i = 0
+    while pending:
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        for task in done:
+            item_data = task_to_data[task]
             item_id = item_data["id"]
             item_query = item_data["query"]
             try:
-                processed_id, original_query, response_text = future.result()
+                processed_id, original_query, response_text = task.result()
                 results_data.append((processed_id, original_query, response_text))
 
                 panel_content = Text()
@@ -127,7 +135,8 @@ def run_bulk_test(csv_path: Path) -> None:
                 results_data.append(
                     (item_id, item_query, f"Exception during processing: {str(exc)}")
                 )
-        console.print("[bold blue]All queries processed.[/bold blue]")
+            i += 1
+    console.print("[bold blue]All queries processed.[/bold blue]")
 
     timestamp = dt.datetime.now().strftime("%Y%m%d_%H%M%S")
     out_path = RESULTS_DIR / f"results_{timestamp}.csv"
@@ -151,4 +160,4 @@ if __name__ == "__main__":
         help="Path to CSV file containing queries (column name: 'query').",
     )
     args = parser.parse_args()
-    run_bulk_test(args.csv)
+    asyncio.run(run_bulk_test(args.csv))
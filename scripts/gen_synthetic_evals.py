@@ -12,11 +12,25 @@ Using the --verify-dims and --verify-queries flags, we can manually verify the d
 """
 
 from mirascope import llm, prompt_template
-from mirascope.core import FromCallArgs
+from mirascope.core import Messages
 from pydantic import BaseModel, Field
-from typing import Literal, Annotated
+import orjson
+from collections import deque
+from functools import cached_property
+from operator import attrgetter
+from typing import Iterable, Iterator, Literal
 import argparse
+import asyncio
+import concurrent.futures
 import csv
+import threading
+
+# Maximum number of concurrent query-generation calls, to stay within Gemini's rate limit.
+MAX_CONCURRENCY = 10
+# Number of dimension sets sent to the LLM in a single query-generation call.
+DEFAULT_BATCH_SIZE = 10
+# Number of CSV rows written between flushes to disk.
+FLUSH_EVERY = 64
 
 
 class Dimensions(BaseModel):
@@ -40,6 +54,17 @@ class Dimensions(BaseModel):
         default=None, description="The English proficiency of the user"
     )
 
+    @cached_property
+    def json_fmt(self) -> str:
+        """The dimensions as indented JSON for prompts; serialized once since the same dimensions are formatted into many prompts"""
+        return orjson.dumps(
+            self.model_dump(mode="json"), option=orjson.OPT_INDENT_2
+        ).decode()
+
+
+# CSV column order for the dimensions, matching the model's field order.
+DIMENSION_FIELDS = list(Dimensions.model_fields)
+
 
 @llm.call(provider="gemini", model="gemini-2.5-flash-preview-05-20", response_model=list[Dimensions])
 @prompt_template("""SYSTEM:
@@ -78,15 +103,14 @@ You are an expert product manager. You know exactly how users think, what they w
 """)
 def generate_dimensions(n: int = 10, used_dimensions: list[Dimensions] | None = None):
     used_dimensions_fmt = "\n".join(
-        [d.model_dump_json(indent=2) for d in used_dimensions]
+        [d.json_fmt for d in used_dimensions]
     )
     return {"computed_fields": {"used_dimensions_fmt": used_dimensions_fmt}}
 
 
 class Query(BaseModel):
-    # FromCallArgs is a cool little annotation that takes the argument directly from the call in generate_query. This way we package together the dimensions and the query generated
-    # from it into a single object. See more: https://mirascope.com/docs/mirascope/learn/response_models/#fromcallargs
-    dimensions: Annotated[Dimensions, FromCallArgs()] = Field(
+    # generate_queries returns only the query strings; we package each one together with the dimensions it was generated from.
+    dimensions: Dimensions = Field(
         description="The dimensions of the query to guide the generation process"
     )
     query: str = Field(
@@ -95,40 +119,109 @@ class Query(BaseModel):
 
     def xml(self) -> str:
         """Format the query in an XML format for easier parsing by LLMs"""
-        return f"<example>\n<dimensions>{self.dimensions.model_dump_json(indent=2)}</dimensions>\n<query>{self.query}</query>\n</example>"
+        return f"<example>\n<dimensions>{self.dimensions.json_fmt}</dimensions>\n<query>{self.query}</query>\n</example>"
 
 
-@llm.call(provider="gemini", model="gemini-2.5-flash-preview-05-20", response_model=Query)
-@prompt_template("""SYSTEM:
-<role>
+# The query-generation prompt up to the few-shot examples never changes, so it is built once at import time
+# and each call only appends the parts that vary.
+_QUERY_PROMPT_PREFIX = """<role>
 You are an expert product manager. You know exactly how users think, what they want, and how they express themselves.
 </role>
 <instructions>
-- From the provided dimensions, generate a query that user might use to search for a recipe that fits those dimensions.
+- For each set of provided dimensions, generate a query that user might use to search for a recipe that fits those dimensions.
 - Remember, users use simple language and don't always specify their intent (think ~6th grade level)
 - Vary the phrasing of the queries you generate
 - Use the provided dimensions to guide the generation process
-</instructions>   
+- Return exactly one query per set of dimensions, in the same order as the sets of dimensions
+</instructions>
 <examples>
-{examples_fmt}
-</examples>
-<dimensions>
-{dimensions_fmt}
-</dimensions>
-""")
-def generate_query(dimensions: Dimensions, examples: list[Query] | None = None):
+"""
+
+
+@llm.call(provider="gemini", model="gemini-2.5-flash-preview-05-20", response_model=list[str])
+async def generate_queries(
+    dimensions: list[Dimensions], examples_fmt: str
+) -> Messages.Type:
+    # examples_fmt is the same for every batch, so the caller formats it once and we pass it through verbatim.
+    dimensions_fmt = "\n".join(
+        [f"<dimensions>{d.json_fmt}</dimensions>" for d in dimensions]
+    )
+    return Messages.System(
+        _QUERY_PROMPT_PREFIX
+        + examples_fmt
+        + "\n</examples>\n<dimensions_list>\n"
+        + dimensions_fmt
+        + "\n</dimensions_list>"
+    )
+
+
+async def generate_batch(batch: list[Dimensions], examples_fmt: str) -> list[Query]:
+    """Generate one query for each set of dimensions in the batch with a single LLM call"""
+    queries = await generate_queries(batch, examples_fmt)
+    if len(batch) == 1:
+        if not queries:
+            # Skip these dimensions rather than failing the whole run over one empty reply.
+            print(f"The LLM returned no query for {batch[0]}; skipping")
+            return []
+        return [Query(dimensions=batch[0], query=queries[0])]
+    if len(queries) != len(batch):
+        # The LLM lost track of the count, so we can't tell which query belongs to which dimensions.
+        # Fall back to one call per set of dimensions for this batch rather than failing the whole run.
+        print(
+            f"Expected {len(batch)} queries from the LLM, got {len(queries)}; retrying one at a time"
+        )
+        # Sequential, so this batch still occupies a single slot of MAX_CONCURRENCY.
+        return [q for d in batch for q in await generate_batch([d], examples_fmt)]
+    return [Query(dimensions=d, query=q) for d, q in zip(batch, queries)]
+
+
+async def _cancel_pending_tasks() -> None:
+    """Cancel every other task on the running loop and wait for them to finish"""
+    tasks = [t for t in asyncio.all_tasks() if t is not asyncio.current_task()]
+    for task in tasks:
+        task.cancel()
+    await asyncio.gather(*tasks, return_exceptions=True)
+
+
+def stream_queries(
+    dimensions: list[Dimensions], examples: list[Query], batch_size: int
+) -> Iterator[Query]:
+    """Yield one generated query per set of dimensions, in order, as soon as its batch is ready.
+
+    The LLM calls run on an event loop in a background thread, so in-flight batches keep making progress while the
+    consumer is busy (e.g. waiting at the --verify-queries prompt). Up to MAX_CONCURRENCY batches are in flight at once,
+    so only a bounded number of queries is held in memory regardless of -n.
+    """
     examples_fmt = "\n".join([e.xml() for e in examples])
-    return {
-        "computed_fields": {
-            "examples_fmt": examples_fmt,
-            "dimensions_fmt": dimensions.model_dump_json(indent=2),
-        }
-    }
+    loop = asyncio.new_event_loop()
+    thread = threading.Thread(target=loop.run_forever, daemon=True)
+    thread.start()
+    pending: deque[concurrent.futures.Future[list[Query]]] = deque()
+    try:
+        for i in range(0, len(dimensions), batch_size):
+            batch = dimensions[i : i + batch_size]
+            pending.append(
+                asyncio.run_coroutine_threadsafe(generate_batch(batch, examples_fmt), loop)
+            )
+            if len(pending) >= MAX_CONCURRENCY:
+                yield from pending.popleft().result()
+        while pending:
+            yield from pending.popleft().result()
+    finally:
+        asyncio.run_coroutine_threadsafe(_cancel_pending_tasks(), loop).result()
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join()
+        loop.close()
+
+
+def unique_dimensions(dimensions: list[Dimensions]) -> list[Dimensions]:
+    """Drop repeated sets of dimensions, preserving the order in which they first appear"""
+    return list({d.json_fmt: d for d in dimensions}.values())
 
 
 def get_query(dimensions: Dimensions) -> Query:
     """Get a query manually from user input"""
-    print(dimensions.model_dump_json(indent=2))
+    print(dimensions.json_fmt)
     q = input("Query: ")
     return Query(query=q, dimensions=dimensions)
 
@@ -139,37 +232,31 @@ def should_keep(item: BaseModel) -> bool:
     return input("Keep? (y/n): ") == "y"
 
 
-def write_queries(queries: list[Query], output: str):
-    """Write queries to a CSV file"""
+def echo_queries(queries: Iterable[Query]) -> Iterator[Query]:
+    """Print each query as it passes through"""
+    for q in queries:
+        print(q.dimensions.json_fmt)
+        print(q.query)
+        print()
+        yield q
+
+
+# Fetches every dimension value of a Query in a single C-level call.
+_get_dimension_values = attrgetter(*[f"dimensions.{f}" for f in DIMENSION_FIELDS])
+
+
+def write_queries(queries: Iterable[Query], output: str) -> int:
+    """Write queries to a CSV file as they arrive, returning how many were written"""
+    count = 0
     with open(output, "w", newline="") as f:
         writer = csv.writer(f)
-        writer.writerow(
-            [
-                "id",
-                "query",
-                "cuisine",
-                "dietary_restriction",
-                "available_ingredients",
-                "meal_type",
-                "cooking_time",
-                "skill_level",
-                "english_proficiency",
-            ]
-        )
+        writer.writerow(["id", "query", *DIMENSION_FIELDS])
         for i, q in enumerate(queries, 1):
-            writer.writerow(
-                [
-                    i,
-                    q.query,
-                    q.dimensions.cuisine,
-                    q.dimensions.dietary_restriction,
-                    q.dimensions.available_ingredients,
-                    q.dimensions.meal_type,
-                    q.dimensions.cooking_time,
-                    q.dimensions.skill_level,
-                    q.dimensions.english_proficiency,
-                ]
-            )
+            writer.writerow((i, q.query, *_get_dimension_values(q)))
+            count = i
+            if i % FLUSH_EVERY == 0:
+                f.flush()
+    return count
 
 
 def load_queries(path: str | None = None) -> list[Query]:
@@ -178,21 +265,40 @@ def load_queries(path: str | None = None) -> list[Query]:
         return []
     with open(path, "r") as f:
         reader = csv.reader(f)
-        field_names = next(reader)
+        field_names = next(reader)[2:]
+        # These files are written by write_queries from already-validated models, so we skip re-validation
+        # with model_construct. Empty cells are how write_queries stores missing dimensions.
         return [
-            Query(
-                query=row[1], dimensions=Dimensions(**dict(zip(field_names, row[2:])))
+            Query.model_construct(
+                query=row[1],
+                dimensions=Dimensions.model_construct(
+                    **{k: v or None for k, v in zip(field_names, row[2:])}
+                ),
             )
             for row in reader
         ]
 
 
+def positive_int(value: str) -> int:
+    """argparse type for integer options that must be at least 1"""
+    number = int(value)
+    if number < 1:
+        raise argparse.ArgumentTypeError(f"must be at least 1, got {number}")
+    return number
+
+
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser()
     parser.add_argument("-n", type=int, default=10)
     parser.add_argument("--manual", action="store_true")
     parser.add_argument("--verify-dims", action="store_true")
     parser.add_argument("--verify-queries", action="store_true")
+    parser.add_argument(
+        "--batch-size",
+        type=positive_int,
+        default=DEFAULT_BATCH_SIZE,
+        help="Number of sets of dimensions to generate queries for in a single LLM call",
+    )
     parser.add_argument(
         "--examples",
         type=str,
@@ -211,23 +317,27 @@ def main():
     print(f"Loaded {len(examples)} examples")
     # here we call the llm function we created using mirascope which takes two arguments and returns a list of Dimensions objects.
     dimensions = generate_dimensions(args.n, [e.dimensions for e in examples])
+    # The LLM sometimes repeats itself; each duplicate would otherwise cost its own query generation.
+    dimensions = unique_dimensions(dimensions)
     if args.verify_dims:
         dimensions = [d for d in dimensions if should_keep(d)]
 
     # here we selectively either ask the user for a query given the dimensions or we generate a query using the llm function we created using mirascope
     # depending on the --manual flag.
-    queries = [
-        get_query(d) if args.manual else generate_query(d, examples) for d in dimensions
-    ]
+    # Queries flow through as a stream, so each one is written out as soon as it is produced.
+    queries = (
+        (get_query(d) for d in dimensions)
+        if args.manual
+        else stream_queries(dimensions, examples, args.batch_size)
+    )
     if not args.manual and args.verify_queries:
-        queries = [q for q in queries if should_keep(q)]
-    print(f"Generated {len(queries)} queries")
+        queries = (q for q in queries if should_keep(q))
+    queries = echo_queries(queries)
     if args.output:
-        write_queries(queries, args.output)
-    for q in queries:
-        print(q.dimensions.model_dump_json(indent=2))
-        print(q.query)
-        print()
+        count = write_queries(queries, args.output)
+    else:
+        count = sum(1 for _ in queries)
+    print(f"Generated {count} queries")
 
 
 if __name__ == "__main__":